@@ -6,9 +6,12 @@ Usage:
     python download.py --date 2024-12-30 --out-dir data/2024-12-30
     python download.py --date 2024-12-30 --variant staging-0
     python download.py --date 2024-12-30 --token ghp_xxxx   # avoid rate limits
+    python download.py --date 2024-12-30 --tokens ghp_aaaa,ghp_bbbb   # rotate tokens
 
 The script uses the GitHub API to discover available assets for the date,
-then downloads each split-tar part with a progress bar.
+then downloads the split-tar parts concurrently with per-file progress lines.
+Each part is itself fetched as several parallel HTTP Range requests when the
+server supports them.
 
 Repos by year:
     2024 → adsblol/globe_history_2024
@@ -17,48 +20,296 @@ Repos by year:
 """
 
 import argparse
-import sys
-import urllib.request
-import urllib.error
 import json
+import math
+import os
+import re
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+import httpx
+
+# Default number of parts downloaded at once
+DOWNLOAD_WORKERS = 4
+
+# Default number of parallel Range requests per part, and the smallest slice
+# worth giving its own connection
+DOWNLOAD_CONNECTIONS = 4
+MIN_RANGE_BYTES = 8 * 1024 * 1024
+
+CHUNK_BYTES = 1024 * 1024  # 1 MB
+
+# On-disk cache of full release listings, and how long one is trusted
+# before being revalidated with its ETag
+RELEASE_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "adsb"
+RELEASE_CACHE_TTL_S = 3600
+
+# GitHub API calls are small, so they share one multiplexed HTTP/2 connection
+_API_CLIENT = httpx.Client(http2=True, follow_redirects=True, timeout=60)
+
+# Downloads stay on HTTP/1.1: HTTP/2 would put every part and Range slice on
+# one TCP connection, defeating the point of fetching them in parallel. The
+# pool is unbounded (the download threads, workers x connections, already
+# bound it): a slice queued for a free slot could outlive the signed
+# redirect URL it was resolved to and fail with a 403.
+_DOWNLOAD_CLIENT = httpx.Client(
+    follow_redirects=True,
+    timeout=60,
+    limits=httpx.Limits(max_connections=None),
+)
+
+# Serialises progress output from concurrent downloads
+_print_lock = threading.Lock()
+
+
+def _log(msg: str) -> None:
+    with _print_lock:
+        print(msg, flush=True)
+
 
 # ---------------------------------------------------------------------------
 # GitHub API helpers
 # ---------------------------------------------------------------------------
 
-def gh_get(url: str, token: str | None) -> dict | list:
-    req = urllib.request.Request(url)
-    req.add_header("Accept", "application/vnd.github+json")
-    req.add_header("X-GitHub-Api-Version", "2022-11-28")
+def _is_rate_limited(resp: httpx.Response) -> bool:
+    """True if a 403/429 is a rate limit rather than a real denial.
+
+    GitHub also answers 403 for e.g. SSO-restricted tokens or forbidden
+    repos; those won't succeed after a cool-off.
+    """
+    if resp.status_code not in (403, 429):
+        return False
+    return (resp.status_code == 429
+            or resp.headers.get("X-RateLimit-Remaining") == "0"
+            or "Retry-After" in resp.headers
+            or "rate limit" in resp.text.lower())
+
+
+class TokenPool:
+    """GitHub tokens used round-robin, preferring the one with most quota left.
+
+    Quota is tracked from X-RateLimit-Remaining / X-RateLimit-Reset and
+    Retry-After; a rate-limited token cools off until it may be used again.
+    An empty pool makes unauthenticated requests.
+    """
+
+    # Cool-off for a rate limit that carries no reset hint (per GitHub's docs)
+    DEFAULT_COOL_OFF_S = 60
+
+    def __init__(self, tokens=()):
+        self.tokens: list[str | None] = list(dict.fromkeys(t.strip() for t in tokens if t and t.strip()))
+        if not self.tokens:
+            self.tokens = [None]
+        self.remaining: dict[str | None, float] = {t: math.inf for t in self.tokens}
+        self.resume_at: dict[str | None, float] = {t: 0.0 for t in self.tokens}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str | None:
+        """Return the next usable token, sleeping if every token is cooling off."""
+        with self._lock:
+            now = time.time()
+            order = self.tokens[self._next:] + self.tokens[:self._next]
+            ready = [t for t in order if self.resume_at[t] <= now]
+            if ready:
+                token = max(ready, key=self.remaining.__getitem__)
+                delay = 0.0
+            else:
+                token = min(order, key=self.resume_at.__getitem__)
+                delay = self.resume_at[token] - now
+            self._next = (self.tokens.index(token) + 1) % len(self.tokens)
+        if delay > 0:
+            _log(f"  GitHub rate limit reached on all tokens; waiting {delay:.0f}s ...")
+            time.sleep(delay)
+        return token
+
+    def update(self, token: str | None, resp: httpx.Response) -> None:
+        """Record the quota headers of a response made with token."""
+        now = time.time()
+        remaining = resp.headers.get("X-RateLimit-Remaining", "")
+        retry_after = resp.headers.get("Retry-After", "")
+        with self._lock:
+            if remaining.isdigit():
+                self.remaining[token] = int(remaining)
+            if retry_after.isdigit():
+                self.resume_at[token] = now + int(retry_after)
+            elif self.remaining[token] == 0:
+                reset = resp.headers.get("X-RateLimit-Reset", "")
+                self.resume_at[token] = float(reset) if reset.isdigit() else now + self.DEFAULT_COOL_OFF_S
+            elif _is_rate_limited(resp):
+                self.resume_at[token] = now + self.DEFAULT_COOL_OFF_S
+            if self.resume_at[token] > now:
+                # Fresh quota once the cool-off ends
+                self.remaining[token] = math.inf
+
+
+def gh_request(url: str, tokens: TokenPool, headers: dict | None = None) -> httpx.Response:
+    token = tokens.acquire()
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+        **(headers or {}),
+    }
     if token:
-        req.add_header("Authorization", f"Bearer {token}")
-    with urllib.request.urlopen(req) as resp:
-        return json.load(resp)
+        headers["Authorization"] = f"Bearer {token}"
+    resp = _API_CLIENT.get(url, headers=headers)
+    tokens.update(token, resp)
+    return resp
+
+
+def gh_get(url: str, tokens: TokenPool) -> dict | list:
+    resp = gh_request(url, tokens)
+    resp.raise_for_status()
+    return resp.json()
+
 
+def _minimal_asset(asset: dict) -> dict:
+    return {k: asset[k] for k in ("name", "size", "browser_download_url")}
 
-def find_release_assets(repo: str, date: str, variant: str, token: str | None) -> list[dict]:
+
+def _valid_asset(asset) -> bool:
+    return (isinstance(asset, dict)
+            and isinstance(asset.get("name"), str)
+            and isinstance(asset.get("size"), int)
+            and isinstance(asset.get("browser_download_url"), str))
+
+
+def _valid_release_cache(cached) -> bool:
+    """True if cached has the shape release_index writes, down to each asset."""
+    return (isinstance(cached, dict)
+            and isinstance(cached.get("fetched_at"), (int, float))
+            and isinstance(cached.get("etag"), (str, type(None)))
+            and isinstance(cached.get("releases"), dict)
+            and all(isinstance(assets, list) and all(map(_valid_asset, assets))
+                    for assets in cached["releases"].values()))
+
+
+def list_all_releases(repo: str, tokens: TokenPool,
+                      etag: str | None = None) -> tuple[dict[str, list[dict]], str | None] | None:
+    """
+    Fetch every release of repo, 100 per page, following Link: rel="next".
+    Returns ({tag: assets}, ETag of the first page), or None if etag was
+    given and the listing is unchanged (304 Not Modified).
+    """
+    url = f"https://api.github.com/repos/{repo}/releases?per_page=100"
+    resp = gh_request(url, tokens, {"If-None-Match": etag} if etag else None)
+    if resp.status_code == 304:
+        return None
+    resp.raise_for_status()
+    first_etag = resp.headers.get("ETag")
+    releases = {}
+    while True:
+        for rel in resp.json():
+            releases[rel["tag_name"]] = [_minimal_asset(a) for a in rel.get("assets", [])]
+        next_url = resp.links.get("next", {}).get("url")
+        if not next_url:
+            return releases, first_etag
+        resp = gh_request(next_url, tokens)
+        resp.raise_for_status()
+
+
+# Date part of a release tag like v2024.12.30-planes-readsb-prod-0
+_TAG_DATE_RE = re.compile(r"v(\d{4}\.\d{2}\.\d{2})-")
+
+# Release indexes already loaded in this process, by repo; None records a
+# listing that failed, so it is not retried for every date
+_release_indexes: dict[str, dict[str, list[dict]] | None] = {}
+
+
+def release_index(repo: str, tokens: TokenPool, fetch: bool = True) -> dict[str, list[dict]] | None:
+    """
+    Map tag -> assets for every release of repo, cached on disk under
+    RELEASE_CACHE_DIR. A cache younger than RELEASE_CACHE_TTL_S is used as-is;
+    an older one is revalidated with If-None-Match. With fetch=False only a
+    fresh cache is used. Returns None when no index is available.
+    """
+    if repo in _release_indexes:
+        return _release_indexes[repo]
+
+    path = RELEASE_CACHE_DIR / f"releases_{repo.replace('/', '_')}.json"
+    try:
+        cached = json.loads(path.read_text())
+        # Anything but the shape written below is treated as no cache
+        if not _valid_release_cache(cached):
+            cached = None
+    except (OSError, ValueError):
+        cached = None
+
+    if cached and time.time() - cached["fetched_at"] < RELEASE_CACHE_TTL_S:
+        index = cached["releases"]
+    elif not fetch:
+        return None
+    else:
+        print(f"Listing all releases in {repo} ...")
+        try:
+            listing = list_all_releases(repo, tokens, cached and cached.get("etag"))
+        except httpx.HTTPStatusError as e:
+            print(f"  Release listing failed ({e.response.status_code}); looking up dates one by one.")
+            _release_indexes[repo] = None
+            return None
+        if listing is None:
+            index, etag = cached["releases"], cached.get("etag")
+        else:
+            index, etag = listing
+        print(f"  {len(index)} release(s) listed.")
+        # The cache is only an optimisation: a failed write keeps the index
+        # in memory. Write-then-rename so concurrent runs never see a torn file.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({"etag": etag, "fetched_at": time.time(), "releases": index}))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"  Could not cache the release listing: {e}")
+            if tmp.exists():
+                tmp.unlink()
+
+    _release_indexes[repo] = index
+    return index
+
+
+def find_release_assets(repo: str, date: str, variant: str, tokens: TokenPool,
+                        bulk: bool = False) -> list[dict]:
     """
     Return the list of tar asset dicts for the release matching
     v{date}-planes-readsb-{variant} in the given repo.
     Returns an empty list if the release is not found or has no assets.
+
+    The tag is first looked up in the repo's cached release index (fetched
+    if bulk is set, see release_index); tags missing from it fall back to a
+    per-tag API call. So do tags of the index's newest date, whose parts may
+    still have been uploading when the index was listed. A rate-limited
+    lookup is retried once with the next available token.
     """
     tag = f"v{date}-planes-readsb-{variant}"
-    url = f"https://api.github.com/repos/{repo}/releases/tags/{tag}"
     print(f"Looking up release: {tag} in {repo} ...")
-    try:
-        release = gh_get(url, token)
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            print(f"  Release not found: {tag}")
-            return []
-        if e.code == 403:
-            print(f"  Rate-limited (403) for {tag}. Use --token to increase limits.")
-            return []
-        raise
+    index = release_index(repo, tokens, fetch=bulk)
+    if index is not None and tag in index:
+        newer = any(m and m.group(1) > date for m in map(_TAG_DATE_RE.match, index))
+        if newer:
+            return [a for a in index[tag] if ".tar" in a["name"]]
+
+    url = f"https://api.github.com/repos/{repo}/releases/tags/{tag}"
+    for attempt in range(2):
+        try:
+            release = gh_get(url, tokens)
+            break
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status == 404:
+                print(f"  Release not found: {tag}")
+                return []
+            if _is_rate_limited(e.response):
+                if attempt == 0:
+                    print(f"  Rate-limited ({status}) for {tag}; retrying with the next token ...")
+                    continue
+                print(f"  Rate-limited ({status}) for {tag}. Use --token/--tokens to increase limits.")
+                return []
+            raise
     return [a for a in release.get("assets", []) if ".tar" in a["name"]]
 
 
@@ -66,44 +317,140 @@ def find_release_assets(repo: str, date: str, variant: str, token: str | None) -
 # Download with progress
 # ---------------------------------------------------------------------------
 
-def download_file(url: str, dest: Path, token: str | None) -> None:
-    req = urllib.request.Request(url)
+class _Progress:
+    """Thread-safe byte counter that logs one line per 10% of a file."""
+
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.next_report = 0.1
+        self.lock = threading.Lock()
+
+    def add(self, n: int) -> None:
+        with self.lock:
+            self.done += n
+            # One whole line per 10% (or per 100 MB if the size is unknown)
+            # so lines from concurrent downloads don't clobber each other
+            if self.total:
+                if self.done / self.total < self.next_report:
+                    return
+                line = (f"  {self.name}  {self.done / 1_000_000:.0f}/{self.total / 1_000_000:.0f} MB"
+                        f"  ({self.done / self.total * 100:.0f}%)")
+            else:
+                if self.done < self.next_report * 1_000_000_000:
+                    return
+                line = f"  {self.name}  {self.done / 1_000_000:.0f} MB"
+            self.next_report += 0.1
+        _log(line)
+
+
+def _range_total(content_range: str | None) -> int | None:
+    """Total size from a Content-Range header like 'bytes 0-0/12345'."""
+    m = re.fullmatch(r"bytes \d+-\d+/(\d+)", (content_range or "").strip())
+    return int(m.group(1)) if m else None
+
+
+class DownloadCancelled(Exception):
+    """Raised inside a download once its stop event is set."""
+
+
+def _copy_stream(resp: httpx.Response, f, progress: _Progress,
+                 stop: threading.Event | None = None) -> int:
+    written = 0
+    for buf in resp.iter_bytes(CHUNK_BYTES):
+        if stop is not None and stop.is_set():
+            raise DownloadCancelled(str(resp.url))
+        f.write(buf)
+        written += len(buf)
+        progress.add(len(buf))
+    return written
+
+
+def _fetch_range(url: str, tmp: Path, start: int, end: int, progress: _Progress,
+                 stop: threading.Event | None = None) -> None:
+    """GET bytes [start, end] of url into the same offsets of tmp."""
+    headers = {"Range": f"bytes={start}-{end}"}
+    with _DOWNLOAD_CLIENT.stream("GET", url, headers=headers) as resp, open(tmp, "r+b") as f:
+        if resp.status_code != 206:
+            raise OSError(f"expected 206 for range {start}-{end}, got {resp.status_code}")
+        f.seek(start)
+        written = _copy_stream(resp, f, progress, stop)
+    if written != end - start + 1:
+        raise OSError(f"short read for range {start}-{end}: {written} bytes")
+
+
+def download_file(url: str, dest: Path, token: str | None,
+                  connections: int = DOWNLOAD_CONNECTIONS,
+                  stop: threading.Event | None = None) -> None:
+    """Download url to dest via a .part file.
+
+    stop: if given and set, the download aborts with DownloadCancelled and
+        the partial file is removed.
+    """
+    # Probe with a one-byte range: a 206 reveals the size and the final
+    # (post-redirect) URL; a 200 means ranges are unsupported and the body
+    # is simply streamed as before.
+    headers = {"Range": "bytes=0-0"}
     # GitHub release downloads redirect to S3; don't send auth header there
     if token and "api.github.com" in url:
-        req.add_header("Authorization", f"Bearer {token}")
+        headers["Authorization"] = f"Bearer {token}"
 
     tmp = dest.with_suffix(dest.suffix + ".part")
     try:
-        with urllib.request.urlopen(req) as resp:
-            total = int(resp.headers.get("Content-Length", 0))
-            downloaded = 0
-            chunk = 1024 * 1024  # 1 MB
+        with _DOWNLOAD_CLIENT.stream("GET", url, headers=headers) as resp:
+            resp.raise_for_status()
+            ranged = resp.status_code == 206
+            total = _range_total(resp.headers.get("Content-Range")) if ranged else None
+            final_url = str(resp.url)
+            if not ranged:
+                progress = _Progress(dest.name, int(resp.headers.get("Content-Length", 0)))
+                with open(tmp, "wb") as f:
+                    _copy_stream(resp, f, progress, stop)
 
+        if ranged and total is None:
+            # Ranges work but the size is unknown; fetch the whole body
+            with _DOWNLOAD_CLIENT.stream("GET", final_url) as resp, open(tmp, "wb") as f:
+                resp.raise_for_status()
+                _copy_stream(resp, f, _Progress(dest.name, 0), stop)
+        elif total is not None:
             with open(tmp, "wb") as f:
-                while True:
-                    buf = resp.read(chunk)
-                    if not buf:
-                        break
-                    f.write(buf)
-                    downloaded += len(buf)
-                    if total:
-                        pct = downloaded / total * 100
-                        mb_done = downloaded / 1_000_000
-                        mb_total = total / 1_000_000
-                        print(
-                            f"\r  {dest.name}  {mb_done:.0f}/{mb_total:.0f} MB  ({pct:.1f}%)",
-                            end="", flush=True,
-                        )
-                    else:
-                        mb_done = downloaded / 1_000_000
-                        print(f"\r  {dest.name}  {mb_done:.0f} MB", end="", flush=True)
-        print()  # newline after progress
+                f.truncate(total)
+            k = max(1, min(connections, math.ceil(total / MIN_RANGE_BYTES)))
+            step = math.ceil(total / k)
+            progress = _Progress(dest.name, total)
+            with ThreadPoolExecutor(max_workers=k) as ex:
+                list(ex.map(
+                    lambda start: _fetch_range(final_url, tmp, start, min(start + step, total) - 1, progress, stop),
+                    range(0, total, step),
+                ))
         tmp.rename(dest)
     except Exception:
         tmp.unlink(missing_ok=True)
         raise
 
 
+def download_asset(asset: dict, dest: Path, token: str | None,
+                   connections: int = DOWNLOAD_CONNECTIONS,
+                   stop: threading.Event | None = None) -> None:
+    """Download one release asset to dest, logging its size and throughput."""
+    _log(f"  Downloading {asset['name']} ({asset['size'] / 1e6:.0f} MB) ...")
+    t0 = time.perf_counter()
+    download_file(asset["browser_download_url"], dest, token, connections, stop)
+    elapsed = time.perf_counter() - t0
+    mb = asset["size"] / 1_000_000
+    _log(f"  → {dest}  ({mb:.0f} MB in {elapsed:.0f}s, {mb/elapsed:.1f} MB/s)")
+
+
+def download_assets(jobs: list[tuple[dict, Path]], token: str | None,
+                    workers: int = DOWNLOAD_WORKERS,
+                    connections: int = DOWNLOAD_CONNECTIONS) -> None:
+    """Download (asset, dest) pairs using up to `workers` concurrent streams."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        # Consume the iterator so the first failure is re-raised here
+        list(ex.map(lambda job: download_asset(*job, token, connections), jobs))
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -124,6 +471,12 @@ def main():
                         help="Directory to save files (default: data/)")
     parser.add_argument("--token",   default=None,
                         help="GitHub personal access token (avoids 60 req/hr rate limit)")
+    parser.add_argument("--tokens",  default=None,
+                        help="Comma-separated GitHub tokens to rotate between")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS,
+                        help=f"Parts to download concurrently (default {DOWNLOAD_WORKERS})")
+    parser.add_argument("--connections", type=int, default=DOWNLOAD_CONNECTIONS,
+                        help=f"Parallel Range requests per part (default {DOWNLOAD_CONNECTIONS})")
     args = parser.parse_args()
 
     # Validate date
@@ -139,7 +492,8 @@ def main():
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # Discover assets via GitHub API
-    tar_assets = find_release_assets(repo, dot_date, args.variant, args.token)
+    tokens = TokenPool([args.token, *(args.tokens or "").split(",")])
+    tar_assets = find_release_assets(repo, dot_date, args.variant, tokens)
     if not tar_assets:
         sys.exit(
             f"No .tar assets found. Check the date, variant ({args.variant}), and repo ({repo}).\n"
@@ -152,17 +506,15 @@ def main():
         print(f"  {a['name']}  ({size_mb:.0f} MB)")
     print()
 
-    # Download each part
+    # Download missing parts concurrently
+    jobs = []
     for asset in tar_assets:
         dest = out_dir / asset["name"]
         if dest.exists() and dest.stat().st_size == asset["size"]:
             print(f"  {asset['name']}  already complete, skipping.")
             continue
-        t0 = time.perf_counter()
-        download_file(asset["browser_download_url"], dest, args.token)
-        elapsed = time.perf_counter() - t0
-        mb = asset["size"] / 1_000_000
-        print(f"  → {dest}  ({mb:.0f} MB in {elapsed:.0f}s, {mb/elapsed:.1f} MB/s)")
+        jobs.append((asset, dest))
+    download_assets(jobs, args.token, args.download_workers, args.connections)
 
     print(f"\nDone. Files in: {out_dir}/")
     print()
@@ -23,27 +23,42 @@ Usage:
 
 import argparse
 import csv
-import gzip
-import json
+import io
 import math
+import multiprocessing
+import os
 import re
-import subprocess
 import sys
 import tarfile
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
+import numpy as np
+import orjson
+from isal import igzip, isal_zlib
+
 DATA_DIR = Path("data")
 
+# Trace files handed to a worker process at a time
+SCAN_BATCH = 64
+
+# How far ahead of the tar reader the kernel is asked to prefetch part files
+READAHEAD_BYTES = 64 << 20
+
+# Trace point fields read per row; shorter points are padded with None
+TRACE_FIELDS = 11
+_TRACE_PAD = [None] * TRACE_FIELDS
+
 # ADS-B category A7 = rotorcraft; also catch common helicopter ICAO type codes
 # that may not broadcast the correct category.
-HELI_CATEGORY = {"A7"}
-HELI_TYPES = {
+HELI_CATEGORY = frozenset({"A7"})
+HELI_TYPES = frozenset({
     "EC45", "H145",                    # Airbus H145
     "EC35", "H135",                    # Airbus H135
-    "EC30", "EC35", "EC45", "EC55",    # Airbus light/medium family
+    "EC30", "EC55",                    # Airbus light/medium family
     "B06",  "B407", "B429",            # Bell
     "R22",  "R44",  "R66",             # Robinson
     "S76",  "S92",                     # Sikorsky
@@ -51,7 +66,13 @@ HELI_TYPES = {
     "MD52", "MD60",                    # MD Helicopters
     "AW09", "AW19", "AW13", "AW16",   # Leonardo AW
     "H160", "H175",                    # Airbus heavy
-}
+})
+
+# Top ground speeds used to bound how far an aircraft can get from its first
+# trace point over the trace's duration (generous: jet-stream tailwinds, fast
+# rotorcraft)
+MAX_GROUND_SPEED_KMH = 1300
+HELI_MAX_GROUND_SPEED_KMH = 400
 
 COLUMNS = [
     "timestamp", "icao", "registration", "flight",
@@ -70,6 +91,101 @@ def haversine_km(lat1, lon1, lat2, lon2):
     return R * 2 * math.asin(math.sqrt(a))
 
 
+def _haversine_a_np(lat1_rad, lon1_rad, cos_lat1, lat2, lon2):
+    """The haversine term a = sin²(d / 2R) from one point (pre-converted to
+    radians, with its cosine) to arrays of points in degrees.
+
+    a grows monotonically with distance, so comparing it against
+    _haversine_a_limit(max_km) is equivalent to haversine_km(...) <= max_km
+    without the sqrt/asin.
+    """
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1_rad
+    dlon = np.radians(lon2) - lon1_rad
+    return np.sin(dlat / 2) ** 2 + cos_lat1 * np.cos(lat2) * np.sin(dlon / 2) ** 2
+
+
+def _haversine_a_limit(max_km):
+    """Largest haversine term a whose distance is still within max_km."""
+    R = 6371.0
+    if max_km < 0:
+        return -1.0
+    if max_km >= math.pi * R:
+        return 1.0
+    return math.sin(max_km / (2 * R)) ** 2
+
+
+def _disk_bbox(center_lat, center_lon, max_dist_km):
+    """Tightest lat/lon box containing every point within max_dist_km of the centre."""
+    R = 6371.0
+    r = max_dist_km / R
+    dlat = math.degrees(r) + 1e-9
+    if abs(center_lat) + dlat >= 90:
+        # The disk reaches a pole, so it spans every longitude
+        return max(center_lat - dlat, -90.0), min(center_lat + dlat, 90.0), -math.inf, math.inf
+    dlon = math.degrees(math.asin(math.sin(r) / math.cos(math.radians(center_lat)))) + 1e-9
+    return center_lat - dlat, center_lat + dlat, center_lon - dlon, center_lon + dlon
+
+
+def _inscribed_box(center_lat, center_lon, max_dist_km):
+    """A lat/lon box lying entirely within max_dist_km of the centre, or None.
+
+    Points inside it can be accepted without computing their distance.
+    """
+    h = math.degrees(max_dist_km / 6371.0) / math.sqrt(2)
+    if h <= 0 or abs(center_lat) + h >= 90:
+        return None
+    w = h / math.cos(math.radians(max(abs(center_lat) - h, 0.0)))
+    # The farthest points of the box are its corners; shrink until they fit
+    while max(haversine_km(center_lat, center_lon, center_lat + h, center_lon + w),
+              haversine_km(center_lat, center_lon, center_lat - h, center_lon + w)) >= max_dist_km * (1 - 1e-9):
+        h *= 0.95
+        w *= 0.95
+    return center_lat - h, center_lat + h, center_lon - w, center_lon + w
+
+
+def _out_of_reach(trace, atype, center_lat, center_lon, max_dist_km):
+    """True if no point of the trace can be within max_dist_km of the centre.
+
+    Judged in O(1) from the trace's end points and duration: an aircraft
+    cannot travel further than its top speed allows, so if both the first
+    and the last point are more than max_dist_km + reach away, every point
+    in between is too. Requiring both ends keeps a single bad position from
+    hiding a whole aircraft.
+    """
+    first, last = trace[0], trace[-1]
+    if not (isinstance(first, list) and isinstance(last, list) and len(first) >= 3 and len(last) >= 3):
+        return False
+    t0, t1 = _f(first[0]), _f(last[0])
+    lat0, lon0 = _f(first[1]), _f(first[2])
+    lat1, lon1 = _f(last[1]), _f(last[2])
+    if None in (t0, t1, lat0, lon0, lat1, lon1):
+        return False
+    speed = HELI_MAX_GROUND_SPEED_KMH if atype in HELI_TYPES else MAX_GROUND_SPEED_KMH
+    limit = max_dist_km + speed * max(t1 - t0, 0.0) / 3600
+    return (haversine_km(center_lat, center_lon, lat0, lon0) > limit
+            and haversine_km(center_lat, center_lon, lat1, lon1) > limit)
+
+
+def _is_heli(atype, pts):
+    """True if the aircraft type or any point's category marks a rotorcraft."""
+    if atype in HELI_TYPES:
+        return True
+    return any(
+        len(pt) > 8 and isinstance(pt[8], dict) and pt[8].get("category") in HELI_CATEGORY
+        for pt in pts
+    )
+
+
+def _lat_lon(pts):
+    """(N, 2) float64 array of each point's lat/lon; NaN where not numeric."""
+    try:
+        # numpy already maps None to NaN and parses numeric strings like _f
+        return np.array([pt[1:3] for pt in pts], dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([(_f(pt[1]), _f(pt[2])) for pt in pts], dtype=np.float64)
+
+
 def _f(val):
     try:
         return float(val) if val is not None else None
@@ -81,96 +197,305 @@ def _s(val):
     return str(val).strip() if val is not None else None
 
 
-def stream_pings(parts, lat_min, lat_max, lon_min, lon_max, center_lat, center_lon, max_dist_km, min_alt_ft=None, utc_start=None, utc_end=None, display_tz=None):
-    """Yield one dict per matching trace point, streaming through the tar.
+def _si(val):
+    """_s, interned: for short codes repeated across many rows."""
+    val = _s(val)
+    return sys.intern(val) if val is not None else None
 
-    utc_start/utc_end: if set, only yield pings whose UTC timestamp falls in [start, end).
-    display_tz: if set, output timestamps converted to this timezone.
+
+class ConcatReader(io.RawIOBase):
+    """Read a sequence of files back to back as one stream, like `cat`.
+
+    Where posix_fadvise is available, the kernel is told each part is read
+    sequentially and asked to prefetch a READAHEAD_BYTES window ahead of the
+    reader, so disk reads overlap with decoding.
     """
-    cat = subprocess.Popen(
-        ["cat"] + [str(p) for p in parts],
-        stdout=subprocess.PIPE,
-    )
-    tf = tarfile.open(fileobj=cat.stdout, mode="r|")
 
+    def __init__(self, paths, buffering=4 << 20):
+        self._paths = iter(paths)
+        self._buffering = buffering
+        self._f = None
+        self._pos = 0
+        self._advised = 0
+        self._advance()
+
+    def _advance(self):
+        if self._f is not None:
+            self._f.close()
+        path = next(self._paths, None)
+        self._f = open(path, "rb", buffering=self._buffering) if path is not None else None
+        self._pos = 0
+        self._advised = 0
+        if self._f is not None and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(self._f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            self._prefetch()
+
+    def _prefetch(self):
+        # Top the window up once half of it has been consumed
+        if self._pos + READAHEAD_BYTES // 2 >= self._advised:
+            os.posix_fadvise(self._f.fileno(), self._advised, READAHEAD_BYTES, os.POSIX_FADV_WILLNEED)
+            self._advised += READAHEAD_BYTES
+
+    def readable(self):
+        return True
+
+    def _consumed(self, n):
+        self._pos += n
+        if hasattr(os, "posix_fadvise"):
+            self._prefetch()
+
+    def readinto(self, b):
+        while self._f is not None:
+            n = self._f.readinto(b)
+            if n:
+                self._consumed(n)
+                return n
+            self._advance()
+        return 0
+
+    def read(self, size=-1):
+        # tarfile reads through read(); return the buffered file's bytes as-is
+        # instead of RawIOBase's readinto() into a temporary bytearray that is
+        # then copied again into bytes
+        if size is None or size < 0:
+            return self.readall()
+        while self._f is not None:
+            data = self._f.read(size)
+            if data or not size:
+                self._consumed(len(data))
+                return data
+            self._advance()
+        return b""
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        super().close()
+
+
+def _scan_trace(name, raw, lat_min, lat_max, lon_min, lon_max, center_lat, center_lon, max_dist_km, min_alt_ft=None, utc_start=None, utc_end=None, display_tz=None, inner_box=None, helis_only=False):
+    """Yield one COLUMNS-ordered tuple per matching point of a single (possibly gzipped) trace file.
+
+    name: the tar member name, only used to report unreadable traces.
+
+    inner_box: (lat_min, lat_max, lon_min, lon_max) known to lie within
+        max_dist_km; points inside it skip the distance check.
+    helis_only: if set, only yield points of rotorcraft (see _is_heli).
+    """
+    # Members are usually gzipped despite the .json name; pick the decoder
+    # from the magic bytes rather than trying gzip first
     try:
-        for member in tf:
-            if not member.name.startswith("./traces/") or not member.name.endswith(".json"):
-                continue
+        data = orjson.loads(igzip.decompress(raw) if raw[:2] == b"\x1f\x8b" else raw)
+    except (orjson.JSONDecodeError, OSError, EOFError, isal_zlib.error) as e:
+        print(f"  Skipping unreadable trace {name}: {e}", file=sys.stderr)
+        return
+
+    base_ts  = data.get("timestamp", 0)
+    icao     = _si(data.get("icao", "").lower())
+    reg      = _si(data.get("r"))
+    atype    = _si(data.get("t"))
+    desc     = _s(data.get("desc"))
+    operator = _s(data.get("ownOp"))
+
+    trace = data.get("trace") or []
+    if not trace or _out_of_reach(trace, atype, center_lat, center_lon, max_dist_km):
+        return
+
+    pts = [pt for pt in trace if isinstance(pt, list) and len(pt) >= 3]
+    if not pts:
+        return
+
+    # Bbox and distance filters run over the whole trace at once; only the
+    # surviving points are turned back into Python rows
+    lat_lon = _lat_lon(pts)
+    lats = lat_lon[:, 0]
+    lons = lat_lon[:, 1]
+    idx = np.flatnonzero((lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max))
+    if not idx.size:
+        return
+    lats_in = lats[idx]
+    lons_in = lons[idx]
+    if inner_box is None:
+        ok = np.zeros(idx.size, dtype=bool)
+    else:
+        in_lat_min, in_lat_max, in_lon_min, in_lon_max = inner_box
+        ok = (lats_in >= in_lat_min) & (lats_in <= in_lat_max) & (lons_in >= in_lon_min) & (lons_in <= in_lon_max)
+    rest = ~ok
+    if rest.any():
+        center_lat_rad = math.radians(center_lat)
+        a = _haversine_a_np(center_lat_rad, math.radians(center_lon), math.cos(center_lat_rad),
+                            lats_in[rest], lons_in[rest])
+        ok[rest] = a <= _haversine_a_limit(max_dist_km)
+    idx = idx[ok]
+    if helis_only and idx.size and not _is_heli(atype, pts):
+        return
+
+    # Cleaned (flight, squawk, category) per distinct raw triple, so rows of
+    # the same flight share one set of strings
+    ac_cache = {}
+    for i, lat, lon in zip(idx.tolist(), lats[idx].tolist(), lons[idx].tolist()):
+        # Pad once and unpack, instead of a length check per field
+        (t_offset, _, _, raw_alt, gs, track, _, vrate,
+         ac, source, alt_geom) = (pts[i] + _TRACE_PAD)[:TRACE_FIELDS]
+        alt_baro = _f(raw_alt)
+        if min_alt_ft is not None and (alt_baro is None or alt_baro < min_alt_ft):
+            continue
+
+        offset = _f(t_offset)
+        if offset is None:
+            continue
+        ts = datetime.fromtimestamp(int(base_ts + offset), tz=timezone.utc)
+
+        if utc_start is not None and ts < utc_start:
+            continue
+        if utc_end is not None and ts >= utc_end:
+            continue
+
+        display_ts = ts.astimezone(display_tz) if display_tz else ts
+        if isinstance(ac, dict):
+            raw_ac = (ac.get("flight"), ac.get("squawk"), ac.get("category"))
+            try:
+                ac_fields = ac_cache.get(raw_ac)
+            except TypeError:  # unhashable junk; clean it without caching
+                ac_fields = (_s(raw_ac[0]) or None, _s(raw_ac[1]), _s(raw_ac[2]))
+            if ac_fields is None:
+                ac_fields = ac_cache[raw_ac] = (_s(raw_ac[0]) or None, _si(raw_ac[1]), _si(raw_ac[2]))
+            flight, squawk, category = ac_fields
+        else:
+            flight = squawk = category = None
+
+        # Same order as COLUMNS
+        yield (
+            display_ts.isoformat(),                 # timestamp
+            icao,                                   # icao
+            reg,                                    # registration
+            flight,                                 # flight
+            lat,                                    # lat
+            lon,                                    # lon
+            alt_baro,                               # altitude_baro
+            _f(alt_geom),                           # alt_geom
+            _f(gs),                                 # ground_speed
+            _f(track),                              # track_degrees
+            _f(vrate),                              # vertical_rate
+            atype,                                  # aircraft_type
+            desc,                                   # description
+            operator,                               # operator
+            squawk,                                 # squawk
+            category,                               # category
+            _si(source),                            # source_type
+        )
+
+
+def _scan_batch(blobs, params):
+    """Worker entry point: all matching rows for a batch of (name, raw) trace files."""
+    return [row for name, raw in blobs for row in _scan_trace(name, raw, *params)]
+
+
+def _trace_blobs(tf, icaos=None):
+    """Yield (name, raw bytes) for each ./traces/*.json member of an open tar stream.
+
+    icaos: if set, skip members whose filename (trace_full_<icao>.json) names
+        an aircraft outside this set of lowercase hex codes, without reading them.
+    """
+    for member in tf:
+        # Stream mode still appends every member to tf.members; drop them so
+        # memory stays flat over a day's worth of traces
+        tf.members = []
 
-            f = tf.extractfile(member)
-            if f is None:
-                continue
+        name = member.name
+        if not name.startswith("./traces/") or not name.endswith(".json"):
+            continue
+        if icaos is not None and name[:-5].rsplit("_", 1)[-1].lower() not in icaos:
+            continue
 
-            raw = f.read()
-            try:
-                data = json.loads(gzip.decompress(raw))
-            except Exception:
-                try:
-                    data = json.loads(raw)
-                except Exception:
-                    continue
-
-            base_ts  = data.get("timestamp", 0)
-            icao     = _s(data.get("icao", "").lower())
-            reg      = _s(data.get("r"))
-            atype    = _s(data.get("t"))
-            desc     = _s(data.get("desc"))
-            operator = _s(data.get("ownOp"))
-
-            for pt in data.get("trace", []):
-                if not isinstance(pt, list) or len(pt) < 3:
-                    continue
-
-                lat = _f(pt[1])
-                lon = _f(pt[2])
-                if lat is None or lon is None:
-                    continue
-                if not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max):
-                    continue
-                if haversine_km(center_lat, center_lon, lat, lon) > max_dist_km:
-                    continue
-
-                alt_baro = _f(pt[3]) if len(pt) > 3 else None
-                if min_alt_ft is not None and (alt_baro is None or alt_baro < min_alt_ft):
-                    continue
-
-                offset = _f(pt[0])
-                if offset is None:
-                    continue
-                ts = datetime.fromtimestamp(int(base_ts + offset), tz=timezone.utc)
-
-                if utc_start is not None and ts < utc_start:
-                    continue
-                if utc_end is not None and ts >= utc_end:
-                    continue
-
-                display_ts = ts.astimezone(display_tz) if display_tz else ts
-                ac = pt[8] if len(pt) > 8 and isinstance(pt[8], dict) else {}
-
-                yield {
-                    "timestamp":     display_ts.isoformat(),
-                    "icao":          icao,
-                    "registration":  reg,
-                    "flight":        _s(ac.get("flight")) or None,
-                    "lat":           lat,
-                    "lon":           lon,
-                    "altitude_baro": alt_baro,
-                    "alt_geom":      _f(pt[10]) if len(pt) > 10 else None,
-                    "ground_speed":  _f(pt[4]) if len(pt) > 4 else None,
-                    "track_degrees": _f(pt[5]) if len(pt) > 5 else None,
-                    "vertical_rate": _f(pt[7]) if len(pt) > 7 else None,
-                    "aircraft_type": atype,
-                    "description":   desc,
-                    "operator":      operator,
-                    "squawk":        _s(ac.get("squawk")),
-                    "category":      _s(ac.get("category")),
-                    "source_type":   _s(pt[9]) if len(pt) > 9 else None,
-                }
+        f = tf.extractfile(member)
+        if f is None:
+            continue
+
+        yield name, f.read()
+
+
+def scan_pool(workers):
+    """Process pool for stream_pings, or None if workers <= 1.
+
+    Workers are started from a forkserver (spawn where unavailable) rather
+    than forked: callers such as pipeline.py have download threads running,
+    and forking a multi-threaded process can deadlock on their locks.
+    """
+    if workers <= 1:
+        return None
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def stream_pings(parts, lat_min, lat_max, lon_min, lon_max, center_lat, center_lon, max_dist_km, min_alt_ft=None, utc_start=None, utc_end=None, display_tz=None, workers=1, icaos=None, helis_only=False, pool=None):
+    """Yield one tuple per matching trace point (in COLUMNS order), streaming through the tar.
+
+    utc_start/utc_end: if set, only yield pings whose UTC timestamp falls in [start, end).
+    display_tz: if set, output timestamps converted to this timezone.
+    workers: if > 1, decode and filter trace files in that many processes.
+        The tar itself is still read sequentially (split parts are slices of
+        one archive); rows are yielded in the same order either way.
+    icaos: if set, only scan aircraft with these lowercase ICAO hex codes.
+    helis_only: if set, only yield pings from rotorcraft.
+    pool: a scan_pool(workers) to reuse across calls; if omitted and
+        workers > 1, one is created and shut down for this call.
+    """
+    # Narrow the caller's box to the disk's own envelope; nothing outside it
+    # can pass the distance check anyway
+    disk_lat_min, disk_lat_max, disk_lon_min, disk_lon_max = _disk_bbox(center_lat, center_lon, max_dist_km)
+    params = (max(lat_min, disk_lat_min), min(lat_max, disk_lat_max),
+              max(lon_min, disk_lon_min), min(lon_max, disk_lon_max),
+              center_lat, center_lon, max_dist_km, min_alt_ft, utc_start, utc_end, display_tz,
+              _inscribed_box(center_lat, center_lon, max_dist_km), helis_only)
+    reader = ConcatReader(parts)
+    tf = tarfile.open(fileobj=reader, mode="r|")
+    ex = pool if pool is not None else scan_pool(workers)
+    pending = deque()
+
+    try:
+        blobs = _trace_blobs(tf, icaos)
+        if ex is None:
+            for name, raw in blobs:
+                yield from _scan_trace(name, raw, *params)
+            return
+
+        # Keep a bounded window of batches in flight and drain them in
+        # submission order. A damaged tar still yields every member read
+        # before the damage, as the in-process path does, then raises.
+        batch = []
+        read_error = None
+        try:
+            for blob in blobs:
+                batch.append(blob)
+                if len(batch) == SCAN_BATCH:
+                    pending.append(ex.submit(_scan_batch, batch, params))
+                    batch = []
+                    if len(pending) >= 2 * workers:
+                        yield from pending.popleft().result()
+        except (tarfile.TarError, OSError) as e:
+            read_error = e
+        if batch:
+            pending.append(ex.submit(_scan_batch, batch, params))
+        while pending:
+            yield from pending.popleft().result()
+        if read_error is not None:
+            raise read_error
     finally:
+        for fut in pending:
+            fut.cancel()
+        if ex is not None and ex is not pool:
+            ex.shutdown(cancel_futures=True)
         tf.close()
-        cat.stdout.close()
-        cat.wait()
+        reader.close()
+
+
+def parse_icaos(value):
+    """Parse a comma-separated --icao value into a set of lowercase hex codes (or None)."""
+    if not value:
+        return None
+    return {c.strip().lower() for c in value.split(",") if c.strip()}
 
 
 def group_parts_by_archive(parts):
@@ -178,7 +503,7 @@ def group_parts_by_archive(parts):
 
     Files like v2026.02.05-planes-readsb-prod-0.tar.aa and .tar.ab share the
     prefix "v2026.02.05-planes-readsb-prod-0.tar" and belong to one archive.
-    Each group must be cat-ed together independently.
+    Each group must be concatenated and read as one tar stream.
     """
     groups = defaultdict(list)
     for p in parts:
@@ -196,6 +521,7 @@ def main():
     parser.add_argument("--radius", type=float, default=1,    help="±degrees (default 0.5)")
     parser.add_argument("--limit",  type=int,   default=0,      help="Stop after N rows (0=all)")
     parser.add_argument("--out",    type=str,   default=None,   help="Write CSV to file")
+    parser.add_argument("--flush-every", type=int, default=10_000, help="Rows buffered per CSV write (default 10000)")
     parser.add_argument("--max-dist", type=float, default=161.0, help="Max haversine distance in km (default 100)")
     parser.add_argument("--min-alt",  type=float, default=25000,  help="Minimum altitude_baro in feet (exclude lower/ground)")
     parser.add_argument("--date",     type=str,   default=None,   help="Filter to a specific date YYYY-MM-DD (e.g. 2026-02-05)")
@@ -203,6 +529,12 @@ def main():
     parser.add_argument("--start-time", type=str, default=None,   help="Start time HH:MM within --date (requires --tz and --date)")
     parser.add_argument("--end-time",   type=str, default=None,   help="End time HH:MM within --date (requires --tz and --date)")
     parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--workers",  type=int,   default=os.cpu_count() or 1,
+                        help="Processes decoding trace files (default: CPU count; 1 = in-process)")
+    parser.add_argument("--icao",     type=str,   default=None,
+                        help="Only scan these aircraft (comma-separated ICAO hex codes)")
+    parser.add_argument("--helis-only", action="store_true",
+                        help="Only output rotorcraft (HELI_TYPES or category A7)")
     args = parser.parse_args()
 
     # Resolve timezone
@@ -272,6 +604,7 @@ def main():
         if not parts:
             sys.exit(f"No *.tar.?? files found in {args.data_dir}")
 
+    icaos = parse_icaos(args.icao)
     archive_groups = group_parts_by_archive(parts)
     total_parts = sum(len(g) for g in archive_groups)
 
@@ -295,18 +628,23 @@ def main():
     writer   = None
 
     if args.out:
-        out_file = open(args.out, "w", newline="")
-        writer   = csv.DictWriter(out_file, fieldnames=COLUMNS)
-        writer.writeheader()
+        out_file = open(args.out, "w", newline="", buffering=8 << 20)
+        writer   = csv.writer(out_file)
+        writer.writerow(COLUMNS)
 
     count = 0
     done = False
+    batch = []  # rows not yet handed to the writer
+    pool = scan_pool(args.workers)
     try:
         for i, group in enumerate(archive_groups, 1):
             print(f"Processing archive {i}/{len(archive_groups)}: {group[0].name} … ({len(group)} part(s))")
-            for row in stream_pings(group, lat_min, lat_max, lon_min, lon_max, args.lat, args.lon, args.max_dist, args.min_alt, utc_start, utc_end, display_tz):
+            for row in stream_pings(group, lat_min, lat_max, lon_min, lon_max, args.lat, args.lon, args.max_dist, args.min_alt, utc_start, utc_end, display_tz, args.workers, icaos, args.helis_only, pool):
                 if writer:
-                    writer.writerow({k: row.get(k) for k in COLUMNS})
+                    batch.append(row)
+                    if len(batch) >= args.flush_every:
+                        writer.writerows(batch)
+                        batch.clear()
                 count += 1
                 if count % 100 == 0:
                     sys.stderr.write(f"\r  pings: {count}")
@@ -318,14 +656,18 @@ def main():
                 break
     except KeyboardInterrupt:
         print("\n[interrupted]")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        # Keep the rows found so far even if the search failed
+        if out_file:
+            writer.writerows(batch)
+            out_file.close()
 
     if count > 0:
         sys.stderr.write(f"\r  pings: {count:,}\n")
         sys.stderr.flush()
 
-    if out_file:
-        out_file.close()
-
     print(f"Total pings found: {count:,}")
     if args.out:
         print(f"Saved → {args.out}")
@@ -1,6 +1,7 @@
 """
-pipeline.py — Download missing ADS-B data for a date range, then find pings
-              near a given lat/lon.
+pipeline.py — Download missing ADS-B data for a date range and find pings
+              near a given lat/lon, searching each date as soon as its
+              files are on disk.
 
 Usage:
     python pipeline.py \\
@@ -18,6 +19,10 @@ Usage:
     python pipeline.py --start-date 2026-02-01 --end-date 2026-02-03 \\
         --lat 43.0755 --lon -89.415 --token ghp_xxxx --out out.csv
 
+    # Rotate between several tokens for long date ranges:
+    python pipeline.py --start-date 2025-01-01 --end-date 2025-12-31 \\
+        --lat 43.0755 --lon -89.415 --tokens ghp_aaaa,ghp_bbbb --out out.csv
+
     # With timezone and time window:
     python pipeline.py --start-date 2026-02-05 --end-date 2026-02-05 \\
         --lat 43.0755 --lon -89.415 --tz America/Chicago \\
@@ -27,25 +32,45 @@ Usage:
     python pipeline.py --start-date 2026-02-01 --end-date 2026-02-03 \\
         --lat 0 --lon 0 --download-only
 
+    # Long range on a small disk: delete each date once it has been searched:
+    python pipeline.py --start-date 2025-01-01 --end-date 2025-03-31 \\
+        --lat 43.0755 --lon -89.415 --delete-after-scan --out q1.csv
+
 Download behaviour:
     - Files are saved to --data-dir (default: data/).
     - A file is skipped if it already exists with the correct size.
+    - Missing parts are downloaded up to --download-workers at a time, at most
+      MAX_PENDING_DATES dates ahead of the ping search, which scans each
+      date as soon as all of its parts are present.
     - Dates whose release is not found on GitHub are skipped with a warning.
 """
 
 import argparse
 import csv
+import os
 import sys
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
-from download import download_file, find_release_assets, repo_for_date
-from find_pings import COLUMNS, group_parts_by_archive, stream_pings
+from download import (
+    DOWNLOAD_CONNECTIONS, DOWNLOAD_WORKERS, TokenPool,
+    download_asset, download_assets, find_release_assets, repo_for_date,
+)
+from find_pings import COLUMNS, group_parts_by_archive, parse_icaos, scan_pool, stream_pings
 
 DATA_DIR = Path("data")
 
+# Ranges at least this long fetch each repo's full (cached) release listing
+# instead of looking every date up individually
+BULK_LOOKUP_MIN_DATES = 15
+
+# Dates that may be downloading or downloaded but not yet searched (bounds
+# disk use together with --delete-after-scan)
+MAX_PENDING_DATES = 3
+
 
 def date_range(start: str, end: str):
     """Yield YYYY-MM-DD strings from start to end inclusive."""
@@ -56,33 +81,65 @@ def date_range(start: str, end: str):
         cur += timedelta(days=1)
 
 
-def download_date(date_str: str, out_dir: Path, variant: str,
-                  repo: str | None, token: str | None) -> list[Path]:
-    """Download all tar parts for one date. Returns local paths of all parts."""
+def plan_date(date_str: str, out_dir: Path, variant: str,
+              repo: str | None, tokens: TokenPool, bulk: bool = False) -> tuple[list[Path], list[tuple[dict, Path]]]:
+    """Resolve the tar parts for one date.
+
+    Returns (local paths of all parts, (asset, dest) pairs still to download).
+    """
     dot_date = date_str.replace("-", ".")
     used_repo = repo or repo_for_date(date_str)
-    assets = find_release_assets(used_repo, dot_date, variant, token)
+    assets = find_release_assets(used_repo, dot_date, variant, tokens, bulk)
     if not assets:
         # Fall back to whatever is already on disk for this date
         existing = sorted(out_dir.glob(f"v{dot_date}-*.tar.??"))
         if existing:
             print(f"  Using {len(existing)} local file(s) (release unavailable).")
-        return existing
+        return existing, []
 
     parts = []
+    jobs = []
     for asset in assets:
         dest = out_dir / asset["name"]
         if dest.exists() and dest.stat().st_size == asset["size"]:
             print(f"  {asset['name']}  already present, skipping.")
         else:
-            print(f"  Downloading {asset['name']} ({asset['size'] / 1e6:.0f} MB) ...")
-            t0 = time.perf_counter()
-            download_file(asset["browser_download_url"], dest, token)
-            elapsed = time.perf_counter() - t0
-            mb = asset["size"] / 1_000_000
-            print(f"  -> saved {dest.name}  ({mb:.0f} MB in {elapsed:.0f}s, {mb/elapsed:.1f} MB/s)")
+            jobs.append((asset, dest))
         parts.append(dest)
-    return parts
+    return parts, jobs
+
+
+def download_dates(plans, token: str | None, workers: int, connections: int,
+                   max_pending: int = MAX_PENDING_DATES):
+    """Download the plans' missing parts in the background.
+
+    plans: (date, parts, jobs) tuples as built from plan_date().
+    Yields (date, parts) in date order as soon as each date's parts are all
+    on disk. Downloads run at most `max_pending` dates ahead of the date the
+    caller is currently working on. Closing the generator early aborts the
+    downloads still in flight and removes their partial files.
+    """
+    ex = ThreadPoolExecutor(max_workers=max(1, workers))
+    stop = threading.Event()
+    futures = {}
+
+    def submit(i):
+        if i < len(plans):
+            futures[i] = [ex.submit(download_asset, asset, dest, token, connections, stop)
+                          for asset, dest in plans[i][2]]
+
+    try:
+        for i in range(max_pending):
+            submit(i)
+        for i, (d, parts, _) in enumerate(plans):
+            for f in futures.pop(i):
+                f.result()
+            yield d, parts
+            # The caller is done with date i; let the next date start
+            submit(i + max_pending)
+    finally:
+        stop.set()
+        ex.shutdown(wait=False, cancel_futures=True)
 
 
 def main():
@@ -103,6 +160,10 @@ def main():
                         help="Max haversine distance in km (default 161)")
     parser.add_argument("--min-alt",  type=float, default=None,
                         help="Minimum altitude_baro in feet")
+    parser.add_argument("--icao",     type=str,   default=None,
+                        help="Only scan these aircraft (comma-separated ICAO hex codes)")
+    parser.add_argument("--helis-only", action="store_true",
+                        help="Only output rotorcraft (HELI_TYPES or category A7)")
 
     # Time filtering
     parser.add_argument("--tz",         type=str, default=None,
@@ -115,6 +176,10 @@ def main():
     # Output
     parser.add_argument("--out",   type=str, default=None, help="Save pings to CSV")
     parser.add_argument("--limit", type=int, default=0,    help="Stop after N pings (0=all)")
+    parser.add_argument("--flush-every", type=int, default=10_000,
+                        help="Rows buffered per CSV write (default 10000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes decoding trace files (default: CPU count; 1 = in-process)")
 
     # Download config
     parser.add_argument("--data-dir", type=Path, default=DATA_DIR,
@@ -125,8 +190,16 @@ def main():
                         help="GitHub repo override (auto-detected from year if omitted)")
     parser.add_argument("--token",    default=None,
                         help="GitHub personal access token (avoids 60 req/hr rate limit)")
+    parser.add_argument("--tokens",   default=None,
+                        help="Comma-separated GitHub tokens to rotate between")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS,
+                        help=f"Parts to download concurrently (default {DOWNLOAD_WORKERS})")
+    parser.add_argument("--connections", type=int, default=DOWNLOAD_CONNECTIONS,
+                        help=f"Parallel Range requests per part (default {DOWNLOAD_CONNECTIONS})")
     parser.add_argument("--download-only", action="store_true",
                         help="Only download files, skip ping search")
+    parser.add_argument("--delete-after-scan", action="store_true",
+                        help="Delete each date's tar parts once they have been searched")
 
     args = parser.parse_args()
 
@@ -168,23 +241,31 @@ def main():
     args.data_dir.mkdir(parents=True, exist_ok=True)
 
     # ------------------------------------------------------------------
-    # Step 1: Download missing files
+    # Step 1: Resolve the tar parts for every date
     # ------------------------------------------------------------------
     print(f"=== Download: {args.start_date} -> {args.end_date} ({len(dates)} day(s)) ===\n")
-    all_parts: list[Path] = []
+    plans: list[tuple[str, list[Path], list[tuple[dict, Path]]]] = []
+
+    tokens = TokenPool([args.token, *(args.tokens or "").split(",")])
 
     for d in dates:
         print(f"[{d}]")
-        parts = download_date(d, args.data_dir, args.variant, args.repo, args.token)
-        all_parts.extend(parts)
+        parts, pending = plan_date(d, args.data_dir, args.variant, args.repo, tokens,
+                                   bulk=len(dates) >= BULK_LOOKUP_MIN_DATES)
+        plans.append((d, parts, pending))
         print()
 
-    all_parts = sorted(set(all_parts))
-    print(f"Total tar parts: {len(all_parts)}")
+    all_parts = sorted({p for _, parts, _ in plans for p in parts})
+    n_jobs = sum(len(jobs) for _, _, jobs in plans)
+    print(f"Total tar parts: {len(all_parts)} ({n_jobs} to download)")
     for p in all_parts:
         print(f"  {p.name}")
 
     if args.download_only:
+        jobs = [job for _, _, jobs in plans for job in jobs]
+        if jobs:
+            print(f"\nDownloading {len(jobs)} part(s) with up to {args.download_workers} worker(s) ...")
+            download_assets(jobs, args.token, args.download_workers, args.connections)
         print("\n--download-only set; skipping ping search.")
         return
 
@@ -228,38 +309,64 @@ def main():
     out_file = None
     writer   = None
     if args.out:
-        out_file = open(args.out, "w", newline="")
-        writer   = csv.DictWriter(out_file, fieldnames=COLUMNS)
-        writer.writeheader()
-
-    archive_groups = group_parts_by_archive(all_parts)
-    print(f"  {len(archive_groups)} archive(s) to search\n")
+        out_file = open(args.out, "w", newline="", buffering=8 << 20)
+        writer   = csv.writer(out_file)
+        writer.writerow(COLUMNS)
+
+    icaos = parse_icaos(args.icao)
+    n_archives = sum(len(group_parts_by_archive(parts)) for _, parts, _ in plans)
+    print(f"  {n_archives} archive(s) to search")
+    if n_jobs:
+        print(f"  downloading {n_jobs} part(s) with up to {args.download_workers} worker(s), "
+              f"at most {MAX_PENDING_DATES} date(s) ahead of the search")
+    print()
 
     count = 0
     done = False
+    batch = []  # rows not yet handed to the writer
+    i = 0
+    # One pool for every archive; scan_pool avoids forking the download threads
+    pool = scan_pool(args.workers)
+    downloads = download_dates(plans, args.token, args.download_workers, args.connections)
     try:
-        for i, group in enumerate(archive_groups, 1):
-            print(f"  Archive {i}/{len(archive_groups)}: {group[0].name} … ({len(group)} part(s))")
-            for row in stream_pings(
-                group, lat_min, lat_max, lon_min, lon_max,
-                args.lat, args.lon, args.max_dist, args.min_alt,
-                utc_start, utc_end, display_tz,
-            ):
-                if writer:
-                    writer.writerow({k: row.get(k) for k in COLUMNS})
-                count += 1
-                if count % 1_000 == 0:
-                    print(f"  {count:,} pings found so far...", end="\r", flush=True)
-                if args.limit and count >= args.limit:
-                    done = True
+        for d, parts in downloads:
+            for group in group_parts_by_archive(parts):
+                i += 1
+                print(f"  Archive {i}/{n_archives}: {group[0].name} … ({len(group)} part(s))")
+                for row in stream_pings(
+                    group, lat_min, lat_max, lon_min, lon_max,
+                    args.lat, args.lon, args.max_dist, args.min_alt,
+                    utc_start, utc_end, display_tz, args.workers, icaos, args.helis_only, pool,
+                ):
+                    if writer:
+                        batch.append(row)
+                        if len(batch) >= args.flush_every:
+                            writer.writerows(batch)
+                            batch.clear()
+                    count += 1
+                    if count % 1_000 == 0:
+                        print(f"  {count:,} pings found so far...", end="\r", flush=True)
+                    if args.limit and count >= args.limit:
+                        done = True
+                        break
+                if done:
                     break
             if done:
                 break
+            if args.delete_after_scan and parts:
+                for p in parts:
+                    p.unlink(missing_ok=True)
+                print(f"  Deleted {len(parts)} part(s) for {d}")
     except KeyboardInterrupt:
         print("\n[interrupted]")
-
-    if out_file:
-        out_file.close()
+    finally:
+        # Abort downloads for dates that will no longer be searched
+        downloads.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if out_file:
+            writer.writerows(batch)
+            out_file.close()
 
     print(f"\nTotal pings found: {count:,}")
     if args.out: